@@ -0,0 +1,70 @@
+import hashlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from fastapi import Header, Response
+
+def item_etag(updated_at: datetime) -> str:
+    """Strong validator for one version of an item: its quoted updated_at"""
+    return f'"{updated_at.isoformat()}"'
+
+def page_etag(
+    versions: Iterable[Tuple[int, datetime]], has_more: bool, estimated_total: Optional[int] = None
+) -> str:
+    """Strong validator for a list page, from the id and updated_at of every item on it.
+
+    Hashing each row rather than taking the newest updated_at also catches
+    rows that were deleted from, or inserted into, the page. `has_more`
+    covers the page's next_cursor, which appears once rows are added after
+    the last page.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for item_id, updated_at in versions:
+        digest.update(f"{item_id}:{updated_at.isoformat()};".encode())
+    digest.update(b"more;" if has_more else b"last;")
+    if estimated_total is not None:
+        digest.update(f"total:{estimated_total}".encode())
+    return f'"{digest.hexdigest()}"'
+
+def parse_etags(header: str, weak: bool) -> List[str]:
+    """Entity tags listed in a conditional header, as quoted opaque tags.
+
+    With `weak` set, W/ tags are kept and compared by their opaque part
+    (weak comparison); otherwise they are dropped, since they can never
+    match under strong comparison.
+    """
+    tags = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            if not weak:
+                continue
+            tag = tag[2:]
+        if len(tag) >= 2 and tag.startswith('"') and tag.endswith('"'):
+            tags.append(tag)
+    return tags
+
+def none_match(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether If-None-Match names the current version, so a 304 can be sent"""
+    if if_none_match is None:
+        return False
+    return if_none_match.strip() == "*" or etag in parse_etags(if_none_match, weak=True)
+
+def if_match_versions(if_match: Optional[str] = Header(None)) -> Optional[List[datetime]]:
+    """The item versions an If-Match header accepts, or None to accept any.
+
+    Weak and malformed tags can never match under strong comparison, so a
+    header made only of those yields an empty list.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versions = []
+    for tag in parse_etags(if_match, weak=False):
+        try:
+            versions.append(datetime.fromisoformat(tag[1:-1]))
+        except ValueError:
+            continue
+    return versions
+
+def not_modified(etag: str, headers: Dict[str, str]) -> Response:
+    """A 304 carrying the validator and caching headers of the full response"""
+    return Response(status_code=304, headers={"ETag": etag, **headers})
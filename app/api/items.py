@@ -1,57 +1,435 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.schemas.item import Item, ItemCreate, ItemUpdate
-from app.models.item import Item as ItemModel
-from app.database.session import get_primary_session, get_replica_session
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Boolean, Integer, String, any_, bindparam, case, column, delete, exists, func, insert, literal_column, or_, select, table, text, update, values
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import AsyncGenerator, Dict, List, Literal, Optional
+import csv
+import io
+import json
+from app.core.config import settings
+from app.core.cache import item_cache
+from app.schemas.item import Item, ItemBulkUpdate, ItemCreate, ItemPage, ItemUpdate
+from app.models.item import Item as ItemModel, search_document
+from app.database.batching import InsertBatcher
+from app.database.session import CONSISTENCY_HEADER, consistency_token, get_async_replica_db, get_async_replica_session, primary_writer
+from app.api.etags import if_match_versions, item_etag, none_match, not_modified, page_etag
+from app.api.pagination import decode_cursor, encode_cursor, estimated_row_count
 
 router = APIRouter()
 
+items_table = ItemModel.__table__
+
+# Trigrams need at least three characters to narrow a substring search
+SEARCH_MIN_SUBSTRING = 3
+
+# Staging table for COPY-based bulk inserts, dropped when the transaction ends
+bulk_load_table = table("items_bulk_load", column("ord"), column("title"), column("description"))
+
+item_batcher = InsertBatcher(
+    primary_writer, items_table, settings.WRITE_BATCH_WINDOW_MS / 1000, settings.WRITE_BATCH_MAX_SIZE
+)
+
+def read_cache_headers(cache_control: str) -> Dict[str, str]:
+    """Caching headers for reads; tokened reads may see a newer version than others"""
+    headers = {"Vary": CONSISTENCY_HEADER}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return headers
+
+def set_consistency_token(response: Response, lsn: Optional[str]) -> None:
+    """Return the commit LSN so the client can read its own write from a replica"""
+    if lsn is not None:
+        response.headers[CONSISTENCY_HEADER] = lsn
+
 @router.post("/items/", response_model=Item)
-def create_item(item: ItemCreate, db: Session = Depends(get_primary_session)):
+async def create_item(item: ItemCreate, response: Response):
     """Create a new item (writes to primary)"""
-    db_item = ItemModel(**item.model_dump())
-    db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
+    if settings.WRITE_BATCH_ENABLED:
+        row, lsn = await item_batcher.insert(item.model_dump())
+        set_consistency_token(response, lsn)
+        response.headers["ETag"] = item_etag(row["updated_at"])
+        return row
+
+    async def insert_item(db: AsyncSession):
+        db_item = ItemModel(**item.model_dump())
+        db.add(db_item)
+        # The INSERT uses RETURNING, so server defaults are loaded by the flush
+        await db.flush()
+        return db_item
+
+    db_item, lsn = await primary_writer.run(insert_item)
+    set_consistency_token(response, lsn)
+    response.headers["ETag"] = item_etag(db_item.updated_at)
     return db_item
 
-@router.get("/items/", response_model=List[Item])
-def read_items(skip: int = 0, limit: int = 100, db: Session = Depends(get_replica_session)):
-    """Get all items (reads from replica)"""
-    items = db.query(ItemModel).offset(skip).limit(limit).all()
-    return items
+async def _copy_insert(db: AsyncSession, items: List[ItemCreate]):
+    """Load rows through COPY into a temp table, then insert them in one statement"""
+    await db.execute(text(
+        "CREATE TEMP TABLE items_bulk_load (ord integer, title varchar, description varchar) ON COMMIT DROP"
+    ))
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        "items_bulk_load",
+        records=[(i, item.title, item.description) for i, item in enumerate(items)],
+        columns=["ord", "title", "description"],
+    )
+    stmt = (
+        insert(items_table)
+        .from_select(
+            ["title", "description"],
+            select(bulk_load_table.c.title, bulk_load_table.c.description).order_by(bulk_load_table.c.ord),
+        )
+        .returning(*items_table.c)
+    )
+    return (await db.execute(stmt)).mappings().all()
+
+@router.post("/items/bulk", response_model=List[Item])
+async def create_items_bulk(
+    response: Response,
+    items: List[ItemCreate] = Body(..., min_length=1, max_length=settings.BULK_MAX_ITEMS)
+):
+    """Create many items in one transaction (writes to primary)"""
+    async def insert_items(db: AsyncSession):
+        if len(items) > settings.BULK_COPY_THRESHOLD:
+            return await _copy_insert(db, items)
+        stmt = insert(items_table).returning(*items_table.c, sort_by_parameter_order=True)
+        return (await db.execute(stmt, [item.model_dump() for item in items])).mappings().all()
+
+    rows, lsn = await primary_writer.run(insert_items)
+    set_consistency_token(response, lsn)
+    return rows
+
+@router.patch("/items/bulk", response_model=List[Item])
+async def update_items_bulk(
+    response: Response,
+    items: List[ItemBulkUpdate] = Body(..., min_length=1, max_length=settings.BULK_MAX_ITEMS)
+):
+    """Apply partial updates to many items in one statement (writes to primary).
+
+    Ids that do not exist are skipped; only updated rows are returned.
+    """
+    # Later entries for the same id win, as if the updates were applied in order
+    changes = {}
+    for item in items:
+        changes.setdefault(item.id, {}).update(item.model_dump(exclude_unset=True, exclude={"id"}))
+
+    rows = [
+        (item_id, data.get("title"), data.get("description"), "title" in data, "description" in data)
+        for item_id, data in changes.items()
+    ]
+    v = values(
+        column("id", Integer),
+        column("title", String),
+        column("description", String),
+        column("set_title", Boolean),
+        column("set_description", Boolean),
+        name="v",
+    ).data(rows)
+    stmt = (
+        update(items_table)
+        .where(items_table.c.id == v.c.id)
+        .values(
+            title=case((v.c.set_title, v.c.title), else_=items_table.c.title),
+            description=case((v.c.set_description, v.c.description), else_=items_table.c.description),
+        )
+        .returning(*items_table.c)
+    )
+
+    async def apply_updates(db: AsyncSession):
+        result = (await db.execute(stmt)).mappings().all()
+        await item_cache.publish(db, [row["id"] for row in result])
+        return result
+
+    result, lsn = await primary_writer.run(apply_updates, idempotent=True)
+    item_cache.invalidate([row["id"] for row in result])
+    set_consistency_token(response, lsn)
+    return result
+
+@router.delete("/items/bulk")
+async def delete_items_bulk(
+    response: Response,
+    ids: List[int] = Body(..., min_length=1, max_length=settings.BULK_MAX_ITEMS)
+):
+    """Delete many items by id in one statement (writes to primary)"""
+    stmt = (
+        delete(items_table)
+        .where(items_table.c.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))))
+        .returning(items_table.c.id)
+    )
+
+    async def delete_rows(db: AsyncSession):
+        deleted_ids = (await db.scalars(stmt)).all()
+        await item_cache.publish(db, deleted_ids)
+        return deleted_ids
+
+    # A retry after a lost commit would leave out the rows the first attempt deleted
+    deleted_ids, lsn = await primary_writer.run(delete_rows)
+    item_cache.invalidate(deleted_ids)
+    set_consistency_token(response, lsn)
+    return {"message": f"Deleted {len(deleted_ids)} items", "deleted_ids": deleted_ids}
+
+@router.get("/items/", response_model=ItemPage)
+async def read_items(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.PAGE_DEFAULT_LIMIT, ge=1, le=settings.PAGE_MAX_LIMIT),
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_replica_session)
+):
+    """Get a page of items ordered by id (reads from replica).
+
+    Pass the returned next_cursor to fetch the following page; its cost does
+    not depend on how deep into the table the page is. Honours If-None-Match
+    against the page's ETag.
+    """
+    after_id = decode_cursor(cursor)
+    headers = read_cache_headers(settings.HTTP_CACHE_CONTROL_LIST)
+    estimated_total = await estimated_row_count(db, ItemModel.__tablename__) if include_total else None
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Validate against (id, updated_at) alone, which the covering index
+        # answers; the extra row tells whether there is a next page
+        stmt = select(items_table.c.id, items_table.c.updated_at).order_by(items_table.c.id).limit(limit + 1)
+        if after_id is not None:
+            stmt = stmt.where(items_table.c.id > after_id)
+        versions = (await db.execute(stmt)).all()
+        etag = page_etag(versions[:limit], len(versions) > limit, estimated_total)
+        if none_match(if_none_match, etag):
+            return not_modified(etag, headers)
+
+    stmt = select(ItemModel).order_by(ItemModel.id).limit(limit + 1)
+    if after_id is not None:
+        stmt = stmt.where(ItemModel.id > after_id)
+    items = (await db.scalars(stmt)).all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].id)
+
+    response.headers.update(headers)
+    response.headers["ETag"] = page_etag(
+        ((item.id, item.updated_at) for item in items), next_cursor is not None, estimated_total
+    )
+    return ItemPage(items=items, next_cursor=next_cursor, estimated_total=estimated_total)
+
+def _encode_ndjson(keys: List[str], rows) -> bytes:
+    lines = [json.dumps(dict(zip(keys, row)), default=lambda value: value.isoformat()) for row in rows]
+    lines.append("")
+    return "\n".join(lines).encode()
+
+def _encode_csv(rows) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(
+        [value.isoformat() if hasattr(value, "isoformat") else value for value in row] for row in rows
+    )
+    return buffer.getvalue().encode()
+
+async def _export_rows(fmt: str, min_lsn: Optional[int]) -> AsyncGenerator[bytes, None]:
+    """Stream the items table through a server-side cursor, one batch at a time"""
+    keys = list(items_table.c.keys())
+    stmt = (
+        select(*items_table.c)
+        .order_by(items_table.c.id)
+        .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+    )
+    if fmt == "csv":
+        yield _encode_csv([keys])
+    async with get_async_replica_db(min_lsn) as db:
+        result = await db.stream(stmt)
+        async for rows in result.partitions():
+            yield _encode_ndjson(keys, rows) if fmt == "ndjson" else _encode_csv(rows)
+
+@router.get("/items/export")
+async def export_items(request: Request, format: Literal["ndjson", "csv"] = "ndjson"):
+    """Stream every item as NDJSON or CSV (reads from replica).
+
+    Rows are encoded straight from result tuples in batches of
+    EXPORT_BATCH_SIZE, so memory use does not grow with the table.
+    """
+    # The session is opened inside the generator: it has to outlive this
+    # handler and stay open for as long as the response is being sent
+    min_lsn = consistency_token(request)
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return StreamingResponse(
+        _export_rows(format, min_lsn),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="items.{format}"'},
+    )
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _search_condition(mode: str, q: str):
+    """Match condition for a search mode, written to use that mode's index"""
+    if mode == "prefix":
+        return func.lower(items_table.c.title).like(_escape_like(q.lower()) + "%", escape="\\")
+    if mode == "substring":
+        pattern = f"%{_escape_like(q)}%"
+        return or_(
+            items_table.c.title.ilike(pattern, escape="\\"),
+            items_table.c.description.ilike(pattern, escape="\\"),
+        )
+    return search_document.op("@@")(func.websearch_to_tsquery(literal_column("'english'"), q))
+
+@router.get("/items/search", response_model=ItemPage)
+async def search_items(
+    q: str = Query(..., min_length=1, max_length=200),
+    mode: Literal["prefix", "substring", "fulltext"] = "fulltext",
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.PAGE_DEFAULT_LIMIT, ge=1, le=settings.PAGE_MAX_LIMIT),
+    db: AsyncSession = Depends(get_async_replica_session)
+):
+    """Search items (reads from replica).
+
+    `prefix` matches the start of the title, `substring` any part of the title
+    or description, and `fulltext` takes a web-style query over both.
+    Results are ordered by id and paginated with next_cursor like GET /items/.
+    """
+    if mode == "substring" and len(q) < SEARCH_MIN_SUBSTRING:
+        raise HTTPException(
+            status_code=422, detail=f"Substring searches need at least {SEARCH_MIN_SUBSTRING} characters"
+        )
+    stmt = (
+        select(ItemModel)
+        .where(_search_condition(mode, q))
+        # Sorting on id + 0 stops the planner from walking the primary key and
+        # filtering every row, a full scan in disguise when matches are rare
+        .order_by(ItemModel.id + 0)
+        .limit(limit + 1)
+    )
+    after_id = decode_cursor(cursor)
+    if after_id is not None:
+        stmt = stmt.where(ItemModel.id > after_id)
+
+    # Both settings end with the read transaction
+    await db.execute(
+        text("SELECT set_config('statement_timeout', :timeout, true), set_config('enable_seqscan', 'off', true)"),
+        {"timeout": str(settings.SEARCH_STATEMENT_TIMEOUT_MS)},
+    )
+    try:
+        items = (await db.scalars(stmt)).all()
+    except DBAPIError as e:
+        if getattr(e.orig, "sqlstate", None) == "57014":  # query_canceled
+            raise HTTPException(status_code=503, detail="Search timed out; try a more specific query")
+        raise
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].id)
+    return ItemPage(items=items, next_cursor=next_cursor)
 
 @router.get("/items/{item_id}", response_model=Item)
-def read_item(item_id: int, db: Session = Depends(get_replica_session)):
-    """Get a specific item (reads from replica)"""
-    db_item = db.query(ItemModel).filter(ItemModel.id == item_id).first()
+async def read_item(item_id: int, request: Request, db: AsyncSession = Depends(get_async_replica_session)):
+    """Get a specific item (reads from replica, or the item cache when enabled).
+
+    Honours If-None-Match: an unchanged item gets a 304 without its row
+    being fetched or serialized.
+    """
+    headers = read_cache_headers(settings.HTTP_CACHE_CONTROL_ITEM)
+    if_none_match = request.headers.get("if-none-match")
+    # Reads pinned to a write's LSN skip the cache, whose invalidation may not have arrived yet
+    use_cache = settings.ITEM_CACHE_ENABLED and CONSISTENCY_HEADER not in request.headers
+    if use_cache:
+        cached = item_cache.get(item_id)
+        if cached is not None:
+            body, etag = cached
+            if none_match(if_none_match, etag):
+                return not_modified(etag, headers)
+            return Response(content=body, media_type="application/json", headers={"ETag": etag, **headers})
+        generation = item_cache.generation
+
+    if if_none_match is not None:
+        updated_at = (await db.execute(
+            select(items_table.c.updated_at).where(items_table.c.id == item_id)
+        )).scalar_one_or_none()
+        if updated_at is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        etag = item_etag(updated_at)
+        if none_match(if_none_match, etag):
+            return not_modified(etag, headers)
+
+    db_item = await db.get(ItemModel, item_id)
     if db_item is None:
         raise HTTPException(status_code=404, detail="Item not found")
-    return db_item
+
+    body = Item.model_validate(db_item).model_dump_json().encode()
+    etag = item_etag(db_item.updated_at)
+    if use_cache:
+        item_cache.put(item_id, body, etag, generation)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag, **headers})
+
+async def _missing_item_error(db: AsyncSession, item_id: int, versions: Optional[List[datetime]]) -> HTTPException:
+    """Explain why a conditional write matched no row: the item is gone or has changed"""
+    if versions is not None and (await db.execute(select(exists().where(items_table.c.id == item_id)))).scalar():
+        return HTTPException(status_code=412, detail="Item has been modified")
+    return HTTPException(status_code=404, detail="Item not found")
 
 @router.put("/items/{item_id}", response_model=Item)
-def update_item(item_id: int, item: ItemUpdate, db: Session = Depends(get_primary_session)):
-    """Update an item (writes to primary)"""
-    db_item = db.query(ItemModel).filter(ItemModel.id == item_id).first()
-    if db_item is None:
-        raise HTTPException(status_code=404, detail="Item not found")
-    
+async def update_item(
+    item_id: int,
+    item: ItemUpdate,
+    response: Response,
+    versions: Optional[List[datetime]] = Depends(if_match_versions),
+):
+    """Update an item in a single UPDATE ... RETURNING (writes to primary).
+
+    With an If-Match header the update only applies if the item is still at
+    one of the given versions; otherwise it fails with 412.
+    """
     update_data = item.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_item, field, value)
-    
-    db.commit()
-    db.refresh(db_item)
-    return db_item
+    condition = items_table.c.id == item_id
+    if versions is not None:
+        condition &= items_table.c.updated_at.in_(versions)
+    if update_data:
+        stmt = update(items_table).where(condition).values(**update_data).returning(*items_table.c)
+    else:
+        # Nothing to change, so leave updated_at alone and just return the row
+        stmt = select(items_table).where(condition)
+
+    async def apply_update(db: AsyncSession):
+        row = (await db.execute(stmt)).mappings().one_or_none()
+        if row is None:
+            raise await _missing_item_error(db, item_id, versions)
+        if update_data:
+            await item_cache.publish(db, [item_id])
+        return row
+
+    # Re-applying the same values is harmless, but once a conditional update has
+    # committed its retry would no longer match the old version and report 412
+    row, lsn = await primary_writer.run(apply_update, idempotent=versions is None)
+    item_cache.invalidate([item_id])
+    set_consistency_token(response, lsn)
+    response.headers["ETag"] = item_etag(row["updated_at"])
+    return row
 
 @router.delete("/items/{item_id}")
-def delete_item(item_id: int, db: Session = Depends(get_primary_session)):
-    """Delete an item (writes to primary)"""
-    db_item = db.query(ItemModel).filter(ItemModel.id == item_id).first()
-    if db_item is None:
-        raise HTTPException(status_code=404, detail="Item not found")
-    
-    db.delete(db_item)
-    db.commit()
-    return {"message": "Item deleted successfully"} 
\ No newline at end of file
+async def delete_item(
+    item_id: int,
+    response: Response,
+    versions: Optional[List[datetime]] = Depends(if_match_versions),
+):
+    """Delete an item in a single DELETE ... RETURNING (writes to primary)"""
+    condition = items_table.c.id == item_id
+    if versions is not None:
+        condition &= items_table.c.updated_at.in_(versions)
+    stmt = delete(items_table).where(condition).returning(items_table.c.id)
+
+    async def delete_row(db: AsyncSession):
+        if (await db.execute(stmt)).first() is None:
+            raise await _missing_item_error(db, item_id, versions)
+        await item_cache.publish(db, [item_id])
+
+    # A retry after a lost commit would find the row gone and report 404
+    _, lsn = await primary_writer.run(delete_row)
+    item_cache.invalidate([item_id])
+    set_consistency_token(response, lsn)
+    return {"message": "Item deleted successfully"}
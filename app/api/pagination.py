@@ -0,0 +1,36 @@
+import base64
+import json
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+def encode_cursor(last_id: int) -> str:
+    """Encode the last id of a page into an opaque cursor"""
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Decode a cursor produced by encode_cursor, rejecting anything else"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))["id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(last_id, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last_id
+
+async def estimated_row_count(db: AsyncSession, table_name: str) -> Optional[int]:
+    """Planner row estimate from pg_class, avoiding a full COUNT(*) scan"""
+    result = await db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)"),
+        {"name": table_name},
+    )
+    estimate = result.scalar()
+    # reltuples is -1 for tables that have never been vacuumed or analyzed
+    if estimate is None or estimate < 0:
+        return None
+    return estimate
@@ -0,0 +1,105 @@
+import time
+from typing import Dict, Optional
+from app.core.config import settings
+from app.core.metrics import ADMISSION_IN_FLIGHT, ADMISSION_LIMIT, ADMISSION_SHED
+
+class AdmissionController:
+    """Adaptive concurrency limit for database-backed requests (AIMD).
+
+    At the end of every `interval` the connection pools' checkout wait over
+    that window is compared with `target_wait`: when connections were slow
+    to come by the limit is cut by `backoff`, otherwise it grows by one if
+    the window used all of it. Requests beyond the limit are rejected at
+    once instead of queueing for a connection. The class of request that is
+    not prioritised may only fill part of the limit, so it is shed first.
+    """
+
+    def __init__(
+        self,
+        min_limit: int,
+        max_limit: int,
+        initial_limit: int,
+        target_wait: float,
+        interval: float,
+        backoff: float,
+        priority: Optional[str],
+        reserved_fraction: float,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.target_wait = target_wait
+        self.interval = interval
+        self.backoff = backoff
+        self.priority = priority
+        self.reserved_fraction = reserved_fraction
+        self.in_flight = 0
+        self._window_end = time.monotonic() + interval
+        self._window_peak = 0
+        self._wait_total = 0.0
+        self._wait_count = 0
+        # Checkouts still waiting for a connection; a pool stalled for the whole
+        # window reports no completed waits, so these are checked as well
+        self._waiting: Dict[object, float] = {}
+        ADMISSION_LIMIT.set(self.limit)
+
+    def pool_wait_started(self) -> object:
+        token = object()
+        self._waiting[token] = time.monotonic()
+        return token
+
+    def pool_wait_finished(self, token: object, seconds: float) -> None:
+        self._waiting.pop(token, None)
+        self._wait_total += seconds
+        self._wait_count += 1
+
+    def _congested(self, now: float) -> bool:
+        if self._wait_count and self._wait_total / self._wait_count > self.target_wait:
+            return True
+        return any(now - started > self.target_wait for started in self._waiting.values())
+
+    def _adjust(self, now: float) -> None:
+        if now < self._window_end:
+            return
+        if self._congested(now):
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif self._window_peak >= int(self.limit):
+            self.limit = min(self.max_limit, self.limit + 1)
+        ADMISSION_LIMIT.set(self.limit)
+        self._window_end = now + self.interval
+        self._window_peak = self.in_flight
+        self._wait_total = 0.0
+        self._wait_count = 0
+
+    def capacity(self, kind: str) -> int:
+        """How many requests may be in flight when admitting one of this kind"""
+        limit = self.limit
+        if self.priority is not None and kind != self.priority:
+            limit *= 1 - self.reserved_fraction
+        return max(1, int(limit))
+
+    def try_acquire(self, kind: str) -> bool:
+        """Admit a "read" or "write" request, or count it as shed"""
+        self._adjust(time.monotonic())
+        if self.in_flight >= self.capacity(kind):
+            ADMISSION_SHED.labels(kind=kind).inc()
+            return False
+        self.in_flight += 1
+        self._window_peak = max(self._window_peak, self.in_flight)
+        ADMISSION_IN_FLIGHT.inc()
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.dec()
+
+admission_controller = AdmissionController(
+    min_limit=settings.ADMISSION_MIN_LIMIT,
+    max_limit=settings.ADMISSION_MAX_LIMIT,
+    initial_limit=settings.ADMISSION_INITIAL_LIMIT,
+    target_wait=settings.ADMISSION_TARGET_POOL_WAIT_MS / 1000,
+    interval=settings.ADMISSION_INTERVAL_MS / 1000,
+    backoff=settings.ADMISSION_BACKOFF,
+    priority=None if settings.ADMISSION_PRIORITY == "none" else settings.ADMISSION_PRIORITY,
+    reserved_fraction=settings.ADMISSION_RESERVED_FRACTION,
+)
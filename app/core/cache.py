@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.metrics import ITEM_CACHE_EVICTIONS, ITEM_CACHE_HITS, ITEM_CACHE_MISSES
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads are limited to 8000 bytes; larger invalidations flush everything
+MAX_NOTIFY_PAYLOAD = 7900
+INVALIDATE_ALL = "*"
+
+class ItemCache:
+    """Bounded LRU cache of serialized item responses with a TTL.
+
+    The cache only serves entries while `active` is set, i.e. while the
+    invalidation listener is connected; otherwise updates made through
+    other pods could go unnoticed.
+    """
+
+    def __init__(self, max_items: int, ttl: float, hold: float):
+        self.max_items = max_items
+        self.ttl = ttl
+        # After an invalidation, replicas may still return the old row for up
+        # to the maximum tolerated lag, so the id is not re-cached until then
+        self.hold = hold
+        self.active = False
+        self._entries: "OrderedDict[int, Tuple[float, bytes, str]]" = OrderedDict()
+        self._held: Dict[int, float] = {}
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        """Changes on every invalidation; capture it before reading the database"""
+        return self._generation
+
+    def get(self, item_id: int) -> Optional[Tuple[bytes, str]]:
+        """The cached body and ETag of an item"""
+        if not self.active:
+            return None
+        entry = self._entries.get(item_id)
+        if entry is None:
+            ITEM_CACHE_MISSES.inc()
+            return None
+        expires, body, etag = entry
+        if expires < time.monotonic():
+            del self._entries[item_id]
+            ITEM_CACHE_EVICTIONS.labels(reason="expired").inc()
+            ITEM_CACHE_MISSES.inc()
+            return None
+        self._entries.move_to_end(item_id)
+        ITEM_CACHE_HITS.inc()
+        return body, etag
+
+    def put(self, item_id: int, body: bytes, etag: str, generation: int) -> None:
+        """Store a response read while the cache was at `generation`"""
+        if not self.active or generation != self._generation:
+            # An invalidation raced with the read, so the body may be stale
+            return
+        now = time.monotonic()
+        held_until = self._held.get(item_id)
+        if held_until is not None:
+            if held_until > now:
+                return
+            del self._held[item_id]
+        self._entries[item_id] = (now + self.ttl, body, etag)
+        self._entries.move_to_end(item_id)
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+            ITEM_CACHE_EVICTIONS.labels(reason="capacity").inc()
+
+    def invalidate(self, item_ids: Iterable[int]) -> None:
+        self._generation += 1
+        held_until = time.monotonic() + self.hold
+        for item_id in item_ids:
+            self._held[item_id] = held_until
+            if self._entries.pop(item_id, None) is not None:
+                ITEM_CACHE_EVICTIONS.labels(reason="invalidated").inc()
+        # Drop hold markers that have expired so the map stays bounded
+        if len(self._held) > self.max_items:
+            now = time.monotonic()
+            self._held = {k: v for k, v in self._held.items() if v > now}
+
+    def clear(self) -> None:
+        self._generation += 1
+        if self._entries:
+            ITEM_CACHE_EVICTIONS.labels(reason="invalidated").inc(len(self._entries))
+        self._entries.clear()
+        self._held.clear()
+
+    def handle_notification(self, payload: str) -> None:
+        if payload == INVALIDATE_ALL:
+            self.clear()
+            return
+        try:
+            item_ids = [int(part) for part in payload.split(",") if part]
+        except ValueError:
+            logger.warning("Ignoring malformed cache invalidation payload %r", payload)
+            return
+        self.invalidate(item_ids)
+
+    async def publish(self, db: AsyncSession, item_ids: Iterable[int]) -> None:
+        """Queue an invalidation on the session's transaction; NOTIFY fires on commit"""
+        if not settings.ITEM_CACHE_ENABLED:
+            return
+        payload = ",".join(str(item_id) for item_id in item_ids)
+        if len(payload) > MAX_NOTIFY_PAYLOAD:
+            payload = INVALIDATE_ALL
+        await db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": settings.ITEM_CACHE_CHANNEL, "payload": payload},
+        )
+
+class InvalidationListener:
+    """Keeps a LISTEN connection to the primary and applies invalidations to the cache"""
+
+    def __init__(self, cache: ItemCache, dsn: str, channel: str):
+        self.cache = cache
+        # asyncpg takes a plain libpq-style DSN without the SQLAlchemy driver suffix
+        self.dsn = make_url(dsn).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        self.cache.handle_notification(payload)
+
+    async def _run(self) -> None:
+        backoff = 0.5
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                await conn.add_listener(self.channel, self._on_notify)
+                self.cache.active = True
+                backoff = 0.5
+                # NOTIFY delivery gives no error when the socket dies, so poll it
+                while True:
+                    await asyncio.sleep(settings.ITEM_CACHE_KEEPALIVE_SECONDS)
+                    await conn.execute("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Item cache listener disconnected: %s", e)
+            finally:
+                # Notifications may have been missed, so nothing cached can be trusted
+                self.cache.active = False
+                self.cache.clear()
+                if conn is not None:
+                    conn.terminate()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 10)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+item_cache = ItemCache(
+    max_items=settings.ITEM_CACHE_MAX_ITEMS,
+    ttl=settings.ITEM_CACHE_TTL_SECONDS,
+    hold=settings.REPLICA_MAX_LAG_SECONDS + settings.REPLICA_PROBE_INTERVAL,
+)
+
+invalidation_listener = InvalidationListener(item_cache, settings.PRIMARY_DB_URL, settings.ITEM_CACHE_CHANNEL)
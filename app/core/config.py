@@ -1,15 +1,103 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 import os
-from typing import Optional
+from typing import List, Literal, Optional
 
 class Settings(BaseSettings):
     APP_NAME: str = "cloudnativepg-demo"
     APP_PORT: int = 8000
     PRIMARY_DB_URL: str
     REPLICA_DB_URL: str
+    REPLICA_DB_URLS: str = ""  # Comma-separated replica DSNs; overrides REPLICA_DB_URL when set
     ENABLE_METRICS: bool = True
 
+    # Production server (python run.py --prod)
+    WEB_CONCURRENCY: int = 0  # Worker processes; 0 means one per CPU available to the container
+    SHUTDOWN_GRACE_SECONDS: int = 25  # How long in-flight requests may take to drain on SIGTERM
+    # "create" runs create_all at startup; the launcher does it once and starts workers with "skip"
+    DB_SCHEMA_INIT: Literal["create", "skip"] = "create"
+
+    # Connection pools; replica settings apply to each replica engine
+    # With --prod, a non-zero budget caps the connections a pod opens to each
+    # node and is split between the workers, overriding the sizes below
+    DB_CONNECTIONS_PER_POD: int = 0
+    PRIMARY_POOL_SIZE: int = 5
+    PRIMARY_MAX_OVERFLOW: int = 10
+    PRIMARY_POOL_TIMEOUT: float = 30.0
+    PRIMARY_POOL_RECYCLE: int = -1
+    REPLICA_POOL_SIZE: int = 5
+    REPLICA_MAX_OVERFLOW: int = 10
+    REPLICA_POOL_TIMEOUT: float = 30.0
+    REPLICA_POOL_RECYCLE: int = -1
+
+    # Write path failover handling
+    WRITE_RETRY_BASE_SECONDS: float = 0.05
+    WRITE_RETRY_MAX_SECONDS: float = 1.0
+    WRITE_RETRY_DEADLINE_SECONDS: float = 5.0
+    WRITE_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    WRITE_CIRCUIT_RESET_SECONDS: float = 2.0
+
+    # Group commit: coalesce concurrent single-item creates into one INSERT and commit
+    WRITE_BATCH_ENABLED: bool = False
+    WRITE_BATCH_WINDOW_MS: float = 2.0
+    WRITE_BATCH_MAX_SIZE: int = 100
+
+    # Admission control for /items: an adaptive in-flight limit driven by pool checkout wait
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MIN_LIMIT: int = 4
+    ADMISSION_MAX_LIMIT: int = 200
+    ADMISSION_INITIAL_LIMIT: int = 32
+    ADMISSION_TARGET_POOL_WAIT_MS: float = 10.0
+    ADMISSION_INTERVAL_MS: float = 250.0
+    ADMISSION_BACKOFF: float = 0.8  # Factor applied to the limit after a congested interval
+    ADMISSION_PRIORITY: Literal["read", "write", "none"] = "read"
+    ADMISSION_RESERVED_FRACTION: float = 0.2  # Share of the limit only the prioritised class may use
+    ADMISSION_REJECT_STATUS: Literal[429, 503] = 503
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+
+    # Node health probes and replica routing
+    PRIMARY_PROBE_INTERVAL: float = 5.0
+    REPLICA_PROBE_INTERVAL: float = 2.0
+    REPLICA_PROBE_TIMEOUT: float = 1.0
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_FAILURE_THRESHOLD: int = 1
+    REPLICA_LATENCY_EWMA_ALPHA: float = 0.3
+
+    # Read-your-writes: how long a tokened read waits for a replica before using the primary
+    READ_YOUR_WRITES_WAIT_MS: int = 50
+    READ_YOUR_WRITES_POLL_MS: int = 5
+
+    # In-process item cache, invalidated across pods through LISTEN/NOTIFY
+    ITEM_CACHE_ENABLED: bool = False
+    ITEM_CACHE_MAX_ITEMS: int = 10000
+    ITEM_CACHE_TTL_SECONDS: float = 30.0
+    ITEM_CACHE_CHANNEL: str = "items_invalidate"
+    ITEM_CACHE_KEEPALIVE_SECONDS: float = 5.0
+
+    # HTTP caching: Cache-Control for item and list reads ("" to omit). The
+    # default lets caches store responses but revalidate them with If-None-Match
+    HTTP_CACHE_CONTROL_ITEM: str = "no-cache"
+    HTTP_CACHE_CONTROL_LIST: str = "no-cache"
+
+    # Search: per-query time limit, so an unselective search cannot tie up a replica
+    SEARCH_STATEMENT_TIMEOUT_MS: int = 500
+
+    # Pagination
+    PAGE_DEFAULT_LIMIT: int = 100
+    PAGE_MAX_LIMIT: int = 1000
+
+    # Export: rows fetched per server-side cursor round-trip
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # Bulk endpoints
+    BULK_MAX_ITEMS: int = 10000
+    BULK_COPY_THRESHOLD: int = 1000  # Inserts above this size are loaded with COPY
+
+    @property
+    def replica_db_urls(self) -> List[str]:
+        urls = [url.strip() for url in self.REPLICA_DB_URLS.split(",") if url.strip()]
+        return urls or [self.REPLICA_DB_URL]
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,190 @@
+import os
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+
+# With several worker processes, each one writes its samples to files in this
+# directory and /metrics aggregates them; gauges declare how to combine workers
+MULTIPROCESS_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# HTTP metrics, labelled by route template (e.g. /items/{item_id}) to bound cardinality
+REQUEST_COUNT = Counter(
+    'http_requests_total',
+    'Total HTTP requests',
+    ['method', 'endpoint', 'status']
+)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency, until the last body chunk is sent',
+    ['method', 'endpoint']
+)
+
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress',
+    'HTTP requests currently being served',
+    ['method'],
+    multiprocess_mode='livesum'
+)
+
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes',
+    'HTTP response body size',
+    ['method', 'endpoint'],
+    buckets=[256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864]
+)
+
+# Database metrics
+DB_OPERATION_LATENCY = Histogram(
+    'db_operation_duration_seconds',
+    'Database operation latency',
+    ['operation', 'node']
+)
+
+DB_NODE_UP = Gauge(
+    'db_node_up',
+    'Whether the last health probe of the node succeeded',
+    ['node'],
+    multiprocess_mode='livemin'
+)
+
+DB_NODE_IN_RECOVERY = Gauge(
+    'db_node_in_recovery',
+    'Whether the node reported pg_is_in_recovery() (1 for standbys)',
+    ['node'],
+    multiprocess_mode='livemax'
+)
+
+DB_REPLICATION_LAG = Gauge(
+    'db_replication_lag_seconds',
+    'Replay lag of the node as of the last probe',
+    ['node'],
+    multiprocess_mode='livemax'
+)
+
+DB_PROBE_LATENCY = Gauge(
+    'db_probe_latency_seconds',
+    'Round-trip time of the last health probe',
+    ['node'],
+    multiprocess_mode='livemax'
+)
+
+DB_POOL_SATURATION = Gauge(
+    'db_pool_saturation_ratio',
+    'Checked-out connections as a fraction of pool size plus overflow',
+    ['node'],
+    multiprocess_mode='livemax'
+)
+
+# Item cache metrics
+ITEM_CACHE_HITS = Counter(
+    'item_cache_hits_total',
+    'Item reads served from the in-process cache'
+)
+
+ITEM_CACHE_MISSES = Counter(
+    'item_cache_misses_total',
+    'Item reads that had to query the database'
+)
+
+ITEM_CACHE_EVICTIONS = Counter(
+    'item_cache_evictions_total',
+    'Entries removed from the item cache',
+    ['reason']
+)
+
+# Connection pool metrics, recorded from SQLAlchemy pool events
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds',
+    'Time spent waiting for a pooled connection, including connecting when the pool grows (pre-ping is not included)',
+    ['node'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out_connections',
+    'Connections currently checked out of the pool',
+    ['node'],
+    multiprocess_mode='livesum'
+)
+
+DB_POOL_OVERFLOW = Gauge(
+    'db_pool_overflow_connections',
+    'Connections open beyond the configured pool size',
+    ['node'],
+    multiprocess_mode='livesum'
+)
+
+DB_POOL_CONNECTIONS_OPENED = Counter(
+    'db_pool_connections_opened_total',
+    'New physical database connections',
+    ['node']
+)
+
+DB_POOL_CONNECTIONS_CLOSED = Counter(
+    'db_pool_connections_closed_total',
+    'Physical database connections closed, including invalidated ones',
+    ['node']
+)
+
+DB_POOL_CONNECTIONS_INVALIDATED = Counter(
+    'db_pool_connections_invalidated_total',
+    'Connections invalidated after an error (hard) or marked for recycling (soft)',
+    ['node', 'kind']
+)
+
+# Failover handling on the write path
+DB_WRITE_RETRIES = Counter(
+    'db_write_retries_total',
+    'Write transactions retried after a failover error',
+    ['node']
+)
+
+DB_POOL_RESETS = Counter(
+    'db_pool_resets_total',
+    'Times the whole pool was discarded after a failover error',
+    ['node']
+)
+
+DB_CIRCUIT_OPEN = Gauge(
+    'db_circuit_open',
+    'Whether the write circuit breaker is open (failing fast)',
+    ['node'],
+    multiprocess_mode='livemax'
+)
+
+DB_WRITE_BATCH_SIZE = Histogram(
+    'db_write_batch_size',
+    'Rows coalesced into each group-committed insert',
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+)
+
+# Admission control
+ADMISSION_LIMIT = Gauge(
+    'admission_concurrency_limit',
+    'Current adaptive limit on in-flight /items requests',
+    multiprocess_mode='livesum'
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    'admission_in_flight_requests',
+    'Admitted /items requests currently in flight',
+    multiprocess_mode='livesum'
+)
+
+ADMISSION_SHED = Counter(
+    'admission_shed_requests_total',
+    'Requests rejected by admission control',
+    ['kind']
+)
+
+def render_metrics() -> bytes:
+    """Metrics in the Prometheus text format, aggregated across workers in multiprocess mode"""
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+def mark_worker_dead(pid: int) -> None:
+    """Drop the live gauges of a worker that has exited"""
+    if MULTIPROCESS_DIR:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,113 @@
+import time
+from typing import Sequence
+from starlette.responses import JSONResponse
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.admission import AdmissionController
+from app.core.metrics import REQUEST_COUNT, REQUEST_LATENCY, REQUESTS_IN_PROGRESS, RESPONSE_SIZE
+
+# Label for requests that matched no route, so unknown paths share one series
+UNMATCHED_ROUTE = "<unmatched>"
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request count, latency, size and concurrency.
+
+    Requests are labelled by the path template of the route that handled
+    them, which the router stores in the shared scope while dispatching.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        size = 0
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method=method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            duration = time.perf_counter() - start
+            in_progress.dec()
+            route = scope.get("route")
+            endpoint = getattr(route, "path", UNMATCHED_ROUTE)
+            REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(duration)
+            REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=status).inc()
+            RESPONSE_SIZE.labels(method=method, endpoint=endpoint).observe(size)
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware that sheds requests beyond the admission limit.
+
+    Only paths under `path_prefix` are limited. GET and HEAD count as reads,
+    everything else as writes; rejected requests are answered straight away
+    with `Retry-After` instead of waiting for a database connection. They
+    never reach the router, so the route they were meant for is looked up in
+    `routes` and stored in the scope for the metrics middleware.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: AdmissionController,
+        routes: Sequence[BaseRoute],
+        path_prefix: str,
+        status_code: int,
+        retry_after: int,
+    ):
+        self.app = app
+        self.controller = controller
+        self.routes = routes
+        self.path_prefix = path_prefix
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    def _applies(self, path: str) -> bool:
+        return path == self.path_prefix or path.startswith(self.path_prefix + "/")
+
+    def _resolve_route(self, scope: Scope) -> None:
+        partial = None
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                scope["route"] = route
+                return
+            if match == Match.PARTIAL and partial is None:
+                partial = route
+        if partial is not None:
+            # The path matched but not the method
+            scope["route"] = partial
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._applies(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        kind = "read" if scope["method"] in ("GET", "HEAD") else "write"
+        if not self.controller.try_acquire(kind):
+            self._resolve_route(scope)
+            response = JSONResponse(
+                {"detail": "Server is overloaded, retry later"},
+                status_code=self.status_code,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import Table, insert
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.metrics import DB_WRITE_BATCH_SIZE
+from app.database.failover import PrimaryWriter
+
+logger = logging.getLogger(__name__)
+
+Pending = Tuple[Dict[str, Any], "asyncio.Future[Tuple[RowMapping, Optional[str]]]"]
+
+def is_row_error(exc: BaseException) -> bool:
+    """Whether an insert failed on the data of a row (SQLSTATE classes 22 and 23)"""
+    if isinstance(exc, (DataError, IntegrityError)):
+        return True
+    sqlstate = getattr(getattr(exc, "orig", None), "sqlstate", None) or ""
+    return sqlstate[:2] in ("22", "23")
+
+class InsertBatcher:
+    """Coalesces concurrent single-row inserts into one multi-row INSERT and commit.
+
+    A batch is flushed `window` seconds after its first row arrives, or as
+    soon as it holds `max_size` rows. Every caller gets back its own row
+    and the LSN of the shared commit.
+    """
+
+    def __init__(self, writer: PrimaryWriter, table: Table, window: float, max_size: int):
+        self.writer = writer
+        self.window = window
+        self.max_size = max_size
+        self._statement = insert(table).returning(*table.c, sort_by_parameter_order=True)
+        self._pending: List[Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def insert(self, values: Dict[str, Any]) -> Tuple[RowMapping, Optional[str]]:
+        """Queue a row and wait for the commit of the batch it lands in"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((values, future))
+        if len(self._pending) >= self.max_size:
+            self._flush_pending()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush_pending)
+        return await future
+
+    def _flush_pending(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._flush(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    def _operation(self, rows: List[Dict[str, Any]]):
+        async def insert_rows(db: AsyncSession):
+            return (await db.execute(self._statement, rows)).mappings().all()
+        return insert_rows
+
+    async def _write(self, batch: List[Pending]) -> None:
+        rows, lsn = await self.writer.run(self._operation([values for values, _ in batch]))
+        for (_, future), row in zip(batch, rows):
+            if not future.done():
+                future.set_result((row, lsn))
+
+    async def _write_one(self, entry: Pending) -> None:
+        try:
+            await self._write([entry])
+        except Exception as e:
+            self._fail([entry], e)
+
+    async def _flush(self, batch: List[Pending]) -> None:
+        DB_WRITE_BATCH_SIZE.observe(len(batch))
+        try:
+            await self._write(batch)
+        except Exception as e:
+            # Timeouts, cancellations and connection limits would only get worse
+            # as one transaction per row, so those fail the whole batch
+            if len(batch) == 1 or not is_row_error(e):
+                self._fail(batch, e)
+                return
+            # One bad row fails the whole statement; insert the rows one by one
+            # so only the request that sent it gets the error
+            logger.warning("Batched insert of %d rows failed, retrying individually: %s", len(batch), e)
+            await asyncio.gather(*(self._write_one(entry) for entry in batch))
+
+    def _fail(self, batch: List[Pending], error: BaseException) -> None:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    async def close(self) -> None:
+        """Flush anything still queued and wait for in-progress batches"""
+        self._flush_pending()
+        await asyncio.gather(*self._flushes, return_exceptions=True)
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_delay, wait_random_exponential
+from app.core.config import settings
+from app.core.metrics import DB_CIRCUIT_OPEN, DB_POOL_RESETS, DB_WRITE_RETRIES
+from app.database.replicas import DatabaseNode, current_wal_lsn
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# SQLSTATEs raised while the primary is moving: the old primary refuses
+# writes once demoted, and backends are terminated during shutdown
+FAILOVER_SQLSTATES = {
+    "25006",  # read_only_sql_transaction
+    "57P01",  # admin_shutdown
+    "57P02",  # crash_shutdown
+    "57P03",  # cannot_connect_now
+}
+
+class DatabaseUnavailableError(Exception):
+    """The primary could not take the write; the client should retry later"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class CircuitOpenError(DatabaseUnavailableError):
+    pass
+
+def is_failover_error(exc: BaseException) -> bool:
+    """Whether an error means the connection or the node's role is gone"""
+    if isinstance(exc, DBAPIError):
+        if exc.connection_invalidated:
+            return True
+        sqlstate = getattr(exc.orig, "sqlstate", None) or ""
+        return sqlstate in FAILOVER_SQLSTATES or sqlstate.startswith("08")
+    return isinstance(exc, (ConnectionError, OSError))
+
+class CircuitBreaker:
+    """Fails writes fast after repeated failover errors.
+
+    After `reset_timeout` seconds one trial request is let through; its
+    outcome closes the circuit again or re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_started: Optional[float] = None
+
+    def before_call(self) -> None:
+        if self.opened_at is None:
+            return
+        now = time.monotonic()
+        remaining = self.opened_at + self.reset_timeout - now
+        if remaining > 0:
+            raise CircuitOpenError("Primary database unavailable", retry_after=remaining)
+        # Half-open: admit a single trial, or a new one if the last never reported back
+        if self.trial_started is not None and now - self.trial_started < self.reset_timeout:
+            raise CircuitOpenError("Primary database unavailable", retry_after=self.reset_timeout)
+        self.trial_started = now
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info("Circuit for %s closed", self.name)
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started = None
+        DB_CIRCUIT_OPEN.labels(node=self.name).set(0)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.trial_started is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning("Circuit for %s opened after %d failures", self.name, self.failures)
+            self.opened_at = time.monotonic()
+            self.trial_started = None
+            DB_CIRCUIT_OPEN.labels(node=self.name).set(1)
+
+class PrimaryWriter:
+    """Runs write transactions on the primary and rides out switchovers.
+
+    `operation` receives a fresh session on every attempt, performs its
+    statements without committing, and returns the handler's result; the
+    writer commits. Failures before the commit are always safe to retry,
+    failures during the commit only when `idempotent` is set.
+    """
+
+    def __init__(self, node: DatabaseNode):
+        self.node = node
+        self.breaker = CircuitBreaker(
+            node.name, settings.WRITE_CIRCUIT_FAILURE_THRESHOLD, settings.WRITE_CIRCUIT_RESET_SECONDS
+        )
+        # Bumped each time the pool is reset, so a burst of requests failing on
+        # connections from the same pool only triggers one reset
+        self._pool_epoch = 0
+        self._reset_lock = asyncio.Lock()
+
+    async def _reset_pool(self, epoch: int, error: BaseException) -> None:
+        async with self._reset_lock:
+            if epoch != self._pool_epoch:
+                return
+            self._pool_epoch += 1
+            logger.warning("Resetting %s pool after failover error: %s", self.node.name, error)
+            DB_POOL_RESETS.labels(node=self.node.name).inc()
+            await self.node.engine.dispose()
+
+    async def _on_error(self, error: BaseException, epoch: int) -> None:
+        if is_failover_error(error):
+            self.breaker.record_failure()
+            await self._reset_pool(epoch, error)
+        else:
+            # The database answered, even if the answer was an error
+            self.breaker.record_success()
+
+    async def _attempt(
+        self, operation: Callable[[AsyncSession], Awaitable[T]], idempotent: bool
+    ) -> Tuple[T, Optional[str]]:
+        self.breaker.before_call()
+        epoch = self._pool_epoch
+        # The session is bound to a connection held until after the commit, so
+        # the commit LSN is read without checking out (and pinging) again
+        try:
+            conn = await self.node.engine.connect()
+        except Exception as e:
+            await self._on_error(e, epoch)
+            raise
+        try:
+            async with self.node.sessionmaker(bind=conn) as db:
+                try:
+                    result = await operation(db)
+                except Exception as e:
+                    await self._on_error(e, epoch)
+                    raise
+                try:
+                    await db.commit()
+                except Exception as e:
+                    await self._on_error(e, epoch)
+                    if is_failover_error(e) and not idempotent:
+                        raise DatabaseUnavailableError("Write outcome unknown after connection loss") from e
+                    raise
+            self.breaker.record_success()
+            try:
+                lsn = await current_wal_lsn(conn)
+            except Exception:
+                # The write is committed; only the consistency token is lost
+                lsn = None
+        finally:
+            await conn.close()
+        return result, lsn
+
+    def _before_sleep(self, retry_state) -> None:
+        DB_WRITE_RETRIES.labels(node=self.node.name).inc()
+
+    async def run(
+        self, operation: Callable[[AsyncSession], Awaitable[T]], idempotent: bool = False
+    ) -> Tuple[T, Optional[str]]:
+        """Run and commit a write, returning its result and the commit LSN"""
+        try:
+            async for attempt in AsyncRetrying(
+                retry=retry_if_exception(is_failover_error),
+                wait=wait_random_exponential(
+                    multiplier=settings.WRITE_RETRY_BASE_SECONDS, max=settings.WRITE_RETRY_MAX_SECONDS
+                ),
+                stop=stop_after_delay(settings.WRITE_RETRY_DEADLINE_SECONDS),
+                before_sleep=self._before_sleep,
+                reraise=True,
+            ):
+                with attempt:
+                    return await self._attempt(operation, idempotent)
+        except Exception as e:
+            if is_failover_error(e):
+                raise DatabaseUnavailableError("Primary database unavailable") from e
+            raise
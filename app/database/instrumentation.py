@@ -0,0 +1,93 @@
+import time
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.admission import admission_controller
+from app.core.metrics import (
+    DB_OPERATION_LATENCY,
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_CHECKOUT_WAIT,
+    DB_POOL_CONNECTIONS_CLOSED,
+    DB_POOL_CONNECTIONS_INVALIDATED,
+    DB_POOL_CONNECTIONS_OPENED,
+    DB_POOL_OVERFLOW,
+)
+
+# Statement verbs reported as-is; anything else is grouped to keep label cardinality fixed
+OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "COPY", "CREATE", "SET"}
+
+def statement_operation(statement: str) -> str:
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return verb if verb in OPERATIONS else "OTHER"
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waits for a connection.
+
+    The waits are also reported to admission control, which lowers the
+    concurrency limit while connections are slow to come by.
+
+    The node label is taken from the pool's logging name, which SQLAlchemy
+    carries over when the pool is recreated by dispose().
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        token = admission_controller.pool_wait_started()
+        try:
+            return super()._do_get()
+        finally:
+            elapsed = time.perf_counter() - start
+            admission_controller.pool_wait_finished(token, elapsed)
+            DB_POOL_CHECKOUT_WAIT.labels(node=self._orig_logging_name or "unknown").observe(elapsed)
+
+def instrument_engine(engine: AsyncEngine, node: str) -> None:
+    """Record per-statement latency and pool activity for an engine under `node`"""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start_time"].pop()
+        DB_OPERATION_LATENCY.labels(operation=statement_operation(statement), node=node).observe(
+            time.perf_counter() - start
+        )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        # A failed statement never reaches after_cursor_execute
+        stack = context.connection.info.get("query_start_time") if context.connection is not None else None
+        if stack:
+            stack.pop()
+
+    def record_pool_usage(returning: int = 0):
+        DB_POOL_CHECKED_OUT.labels(node=node).set(sync_engine.pool.checkedout() - returning)
+        DB_POOL_OVERFLOW.labels(node=node).set(max(sync_engine.pool.overflow(), 0))
+
+    # Pool events registered on the engine follow it to pools recreated by dispose()
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        record_pool_usage()
+
+    @event.listens_for(sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        # Fires before the connection is back in the queue, so it is still counted
+        record_pool_usage(returning=1)
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS_OPENED.labels(node=node).inc()
+
+    @event.listens_for(sync_engine, "close")
+    def on_close(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS_CLOSED.labels(node=node).inc()
+
+    @event.listens_for(sync_engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        DB_POOL_CONNECTIONS_INVALIDATED.labels(node=node, kind="hard").inc()
+
+    @event.listens_for(sync_engine, "soft_invalidate")
+    def on_soft_invalidate(dbapi_connection, connection_record, exception):
+        DB_POOL_CONNECTIONS_INVALIDATED.labels(node=node, kind="soft").inc()
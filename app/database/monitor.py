@@ -0,0 +1,110 @@
+import asyncio
+import json
+import random
+from typing import Any, Dict, List
+from app.core.config import settings
+from app.core.metrics import (
+    DB_NODE_IN_RECOVERY,
+    DB_NODE_UP,
+    DB_POOL_SATURATION,
+    DB_PROBE_LATENCY,
+    DB_REPLICATION_LAG,
+)
+from app.database.replicas import DatabaseNode, ReplicaRouter
+
+class HealthMonitor:
+    """Probes every database node in the background and caches the results.
+
+    Health endpoints read the cached snapshot, so kubelet probes never touch
+    the database or block the event loop.
+    """
+
+    def __init__(self, router: ReplicaRouter):
+        self.router = router
+        self.started = False
+        self._tasks: List[asyncio.Task] = []
+        self._snapshot: Dict[str, Any] = {"status": "starting", "nodes": {}}
+        self._body = json.dumps(self._snapshot).encode()
+
+    @property
+    def nodes(self) -> List[DatabaseNode]:
+        return [self.router.primary, *self.router.replicas]
+
+    @property
+    def ready(self) -> bool:
+        """Able to serve traffic: first probes done and some node reachable"""
+        return self.started and any(node.healthy for node in self.nodes)
+
+    @property
+    def body(self) -> bytes:
+        """The snapshot pre-encoded as JSON"""
+        return self._body
+
+    def _record(self, node: DatabaseNode) -> None:
+        pool = node.pool_stats()
+        DB_NODE_UP.labels(node=node.name).set(1 if node.healthy else 0)
+        DB_POOL_SATURATION.labels(node=node.name).set(pool["saturation"])
+        if node.healthy:
+            DB_REPLICATION_LAG.labels(node=node.name).set(node.lag)
+            DB_NODE_IN_RECOVERY.labels(node=node.name).set(1 if node.in_recovery else 0)
+            DB_PROBE_LATENCY.labels(node=node.name).set(node.latency or 0.0)
+
+    def _describe(self, node: DatabaseNode) -> Dict[str, Any]:
+        return {
+            "status": "up" if node.healthy else "down",
+            "role": node.role,
+            "lag_seconds": node.lag,
+            "latency_ms": round(node.latency * 1000, 3) if node.latency is not None else None,
+            "pool": node.pool_stats(),
+            "error": node.last_error,
+            "checked_at": node.checked_at,
+        }
+
+    def _refresh(self) -> None:
+        primary = self.router.primary
+        replicas = self.router.replicas
+        primary_up = primary.healthy
+        replica_up = any(node.eligible for node in replicas)
+        if primary_up and all(node.eligible for node in replicas):
+            status = "healthy"
+        elif primary_up or replica_up:
+            status = "degraded"
+        else:
+            status = "unhealthy"
+        self._snapshot = {
+            "status": status,
+            "primary_db": "up" if primary_up else "down",
+            "replica_db": "up" if replica_up else "down",
+            "nodes": {node.name: self._describe(node) for node in self.nodes},
+        }
+        self._body = json.dumps(self._snapshot).encode()
+
+    async def _probe(self, node: DatabaseNode) -> None:
+        await node.probe()
+        self._record(node)
+        self._refresh()
+
+    async def _probe_loop(self, node: DatabaseNode, interval: float) -> None:
+        while True:
+            # Jitter keeps probes from every pod landing on the same instant
+            await asyncio.sleep(interval * random.uniform(0.8, 1.2))
+            await self._probe(node)
+
+    async def start(self) -> None:
+        """Probe every node once, then keep probing each on its own interval"""
+        await asyncio.gather(*(self._probe(node) for node in self.nodes))
+        self._tasks.append(asyncio.create_task(
+            self._probe_loop(self.router.primary, settings.PRIMARY_PROBE_INTERVAL)
+        ))
+        for node in self.router.replicas:
+            self._tasks.append(asyncio.create_task(
+                self._probe_loop(node, settings.REPLICA_PROBE_INTERVAL)
+            ))
+        self.started = True
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self.started = False
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, async_sessionmaker
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Replication lag in seconds; an idle replica that has replayed everything it
+# received is treated as fully caught up rather than "behind since last commit"
+REPLICA_PROBE_QUERY = text("""
+    SELECT
+        pg_is_in_recovery(),
+        CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END,
+        pg_last_wal_replay_lsn()::text
+""")
+
+REPLAY_LSN_QUERY = text("SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn()::text")
+
+def parse_lsn(value: str) -> int:
+    """Convert a textual LSN such as '0/3000060' into a comparable integer"""
+    high, low = value.split("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+async def current_wal_lsn(conn: AsyncConnection) -> str:
+    """WAL position on the primary; after a commit it covers that commit record.
+
+    Read through the asyncpg connection outside any transaction, so it takes
+    a single round-trip instead of BEGIN / SELECT / ROLLBACK.
+    """
+    raw = await conn.get_raw_connection()
+    return await raw.driver_connection.fetchval("SELECT pg_current_wal_lsn()::text")
+
+class DatabaseNode:
+    """A single database endpoint with its pool and the last probe results.
+
+    Probes run on `probe_engine`, which holds one connection of its own, so
+    a busy serving pool shows up in pool_stats rather than as a failed probe.
+    """
+
+    def __init__(self, name: str, engine: AsyncEngine, probe_engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        self.probe_engine = probe_engine
+        self.sessionmaker = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+        self.latency: Optional[float] = None  # EWMA of probe round-trip, seconds
+        self.lag: float = 0.0
+        self.in_recovery: Optional[bool] = None
+        self.replay_lsn: Optional[int] = None
+        self.failures = 0
+        self.in_flight = 0
+        self.last_error: Optional[str] = None
+        self.checked_at: Optional[float] = None  # Wall-clock time of the last probe
+
+    @property
+    def healthy(self) -> bool:
+        return self.failures < settings.REPLICA_FAILURE_THRESHOLD
+
+    @property
+    def eligible(self) -> bool:
+        """Whether reads may be routed to this node"""
+        return self.healthy and self.lag <= settings.REPLICA_MAX_LAG_SECONDS
+
+    def has_replayed(self, lsn: int) -> bool:
+        """Whether the last probe saw this node at or past the given LSN"""
+        if self.in_recovery is False:
+            # A promoted node accepts writes itself, so nothing is pending replay
+            return True
+        return self.replay_lsn is not None and self.replay_lsn >= lsn
+
+    def score(self) -> float:
+        """Lower is better: probe latency scaled by the node's current load"""
+        return (self.latency or 0.0) * (1 + self.in_flight)
+
+    def record_success(self, latency: float) -> None:
+        alpha = settings.REPLICA_LATENCY_EWMA_ALPHA
+        self.latency = latency if self.latency is None else alpha * latency + (1 - alpha) * self.latency
+        self.failures = 0
+        self.last_error = None
+
+    def record_failure(self, error: BaseException) -> None:
+        self.failures += 1
+        self.last_error = str(error) or error.__class__.__name__
+        if self.failures == settings.REPLICA_FAILURE_THRESHOLD:
+            logger.warning("Marking %s unhealthy: %s", self.name, self.last_error)
+
+    @property
+    def role(self) -> Optional[str]:
+        if self.in_recovery is None:
+            return None
+        return "standby" if self.in_recovery else "primary"
+
+    def pool_stats(self) -> Dict[str, float]:
+        """Current pool occupancy; saturation is relative to size plus overflow"""
+        pool = self.engine.pool
+        checked_out = pool.checkedout()
+        capacity = pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+        return {
+            "size": pool.size(),
+            "checked_out": checked_out,
+            "overflow": max(pool.overflow(), 0),
+            "saturation": checked_out / capacity if capacity else 0.0,
+        }
+
+    async def _query_status(self):
+        async with self.probe_engine.connect() as conn:
+            return (await conn.execute(REPLICA_PROBE_QUERY)).one()
+
+    async def probe(self) -> None:
+        """Measure round-trip latency, role and replication lag"""
+        self.checked_at = time.time()
+        start = time.perf_counter()
+        try:
+            # The timeout covers connecting as well, so an unreachable node
+            # can't stall the probe
+            self.in_recovery, lag, replay_lsn = await asyncio.wait_for(
+                self._query_status(), timeout=settings.REPLICA_PROBE_TIMEOUT
+            )
+        except Exception as e:
+            self.record_failure(e)
+            return
+        self.lag = float(lag)
+        self.replay_lsn = parse_lsn(replay_lsn) if replay_lsn else None
+        self.record_success(time.perf_counter() - start)
+
+class ReplicaRouter:
+    """Spreads reads across replicas by latency and lag, falling back to the primary"""
+
+    def __init__(self, primary: DatabaseNode, replicas: List[DatabaseNode]):
+        self.primary = primary
+        self.replicas = replicas
+
+    def _pick(self, candidates: List[DatabaseNode]) -> DatabaseNode:
+        if len(candidates) == 1:
+            return candidates[0]
+        first, second = random.sample(candidates, 2)
+        return first if first.score() <= second.score() else second
+
+    def choose(self) -> DatabaseNode:
+        """Pick the better of two random eligible replicas, or the primary if none are"""
+        candidates = [node for node in self.replicas if node.eligible]
+        if not candidates:
+            return self.primary
+        return self._pick(candidates)
+
+    def choose_for_lsn(self, min_lsn: int) -> DatabaseNode:
+        """Pick a replica for a read that must see min_lsn, preferring ones the last probe saw there"""
+        candidates = [node for node in self.replicas if node.eligible]
+        if not candidates:
+            return self.primary
+        caught_up = [node for node in candidates if node.has_replayed(min_lsn)]
+        return self._pick(caught_up or candidates)
+
+    async def _wait_for_replay(self, db: AsyncSession, min_lsn: int) -> bool:
+        """Whether the server behind this session has replayed min_lsn, waiting briefly for it.
+
+        Checked on the session's own connection: a DSN such as a Service can
+        spread connections over several instances, so the probe's view of
+        the node says nothing about the one this read landed on.
+        """
+        deadline = time.monotonic() + settings.READ_YOUR_WRITES_WAIT_MS / 1000
+        while True:
+            in_recovery, replay_lsn = (await db.execute(REPLAY_LSN_QUERY)).one()
+            if not in_recovery:
+                # A primary has every commit of its own timeline
+                return True
+            if replay_lsn is not None and parse_lsn(replay_lsn) >= min_lsn:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(settings.READ_YOUR_WRITES_POLL_MS / 1000)
+
+    @asynccontextmanager
+    async def _node_session(self, node: DatabaseNode) -> AsyncGenerator[AsyncSession, None]:
+        node.in_flight += 1
+        try:
+            async with node.sessionmaker() as db:
+                yield db
+        except (OperationalError, InterfaceError, OSError) as e:
+            # A broken connection counts as a failed probe so the node is
+            # ejected without waiting for the next probe interval
+            if node is not self.primary:
+                node.record_failure(e)
+            raise
+        except DBAPIError as e:
+            if e.connection_invalidated and node is not self.primary:
+                node.record_failure(e)
+            raise
+        finally:
+            node.in_flight -= 1
+
+    @asynccontextmanager
+    async def session(self, min_lsn: Optional[int] = None) -> AsyncGenerator[AsyncSession, None]:
+        """Open a read session, optionally on a server that has replayed min_lsn.
+
+        Falls back to the primary when the replica's connection has not
+        replayed min_lsn within READ_YOUR_WRITES_WAIT_MS, or fails the check.
+        """
+        if min_lsn is None:
+            async with self._node_session(self.choose()) as db:
+                yield db
+            return
+        node = self.choose_for_lsn(min_lsn)
+        if node is not self.primary:
+            serving = False
+            try:
+                async with self._node_session(node) as db:
+                    if await self._wait_for_replay(db, min_lsn):
+                        serving = True
+                        yield db
+                        return
+            except Exception:
+                # Errors raised by the read itself are the caller's
+                if serving:
+                    raise
+        async with self._node_session(self.primary) as db:
+            yield db
@@ -1,50 +1,133 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from fastapi import HTTPException, Request
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from app.core.config import settings
-from contextlib import contextmanager
-from typing import Generator
-import random
+from app.database.replicas import DatabaseNode, ReplicaRouter, parse_lsn
+from app.database.monitor import HealthMonitor
+from app.database.failover import PrimaryWriter
+from app.database.instrumentation import InstrumentedQueuePool, instrument_engine
+from contextlib import asynccontextmanager
+import logging
+from typing import AsyncGenerator, Optional
 from tenacity import retry, stop_after_attempt, wait_exponential
 
-# Create engines for primary and replica
-primary_engine = create_engine(settings.PRIMARY_DB_URL, pool_pre_ping=True)
-replica_engine = create_engine(settings.REPLICA_DB_URL, pool_pre_ping=True)
+logger = logging.getLogger(__name__)
 
-# Session factories
-PrimarySessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=primary_engine)
-ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+# Write responses carry the commit LSN in this header; reads that echo it back
+# are served by a node that has replayed at least that far
+CONSISTENCY_HEADER = "X-Consistency-Token"
+
+def to_async_url(url: str) -> str:
+    """Rewrite a postgresql:// DSN to use the asyncpg driver"""
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+def to_sync_url(url: str) -> str:
+    """Rewrite a postgresql:// DSN to use psycopg2, the sync driver in requirements.txt.
+
+    SQLAlchemy 2.1 maps a bare postgresql:// to psycopg 3 instead.
+    """
+    return make_url(url).set(drivername="postgresql+psycopg2").render_as_string(hide_password=False)
+
+# Sync engine used only by init_db to create the schema
+primary_engine = create_engine(to_sync_url(settings.PRIMARY_DB_URL), pool_pre_ping=True)
+
+def create_node_engine(
+    url: str, node: str, pool_size: int, max_overflow: int, pool_timeout: float, pool_recycle: int
+) -> AsyncEngine:
+    """Create an instrumented async engine for one database node"""
+    engine = create_async_engine(
+        to_async_url(url),
+        poolclass=InstrumentedQueuePool,
+        pool_logging_name=node,
+        pool_pre_ping=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+    )
+    instrument_engine(engine, node)
+    return engine
+
+def create_probe_engine(url: str) -> AsyncEngine:
+    """Create the engine for a node's health probes: one connection, apart from the serving pool"""
+    return create_async_engine(to_async_url(url), pool_size=1, max_overflow=0)
+
+# Async engines used by the request handlers
+async_primary_engine = create_node_engine(
+    settings.PRIMARY_DB_URL, "primary",
+    settings.PRIMARY_POOL_SIZE, settings.PRIMARY_MAX_OVERFLOW,
+    settings.PRIMARY_POOL_TIMEOUT, settings.PRIMARY_POOL_RECYCLE,
+)
+
+# Reads are spread across every configured replica, falling back to the primary
+primary_node = DatabaseNode("primary", async_primary_engine, create_probe_engine(settings.PRIMARY_DB_URL))
+replica_router = ReplicaRouter(primary_node, [
+    DatabaseNode(
+        f"replica-{i}",
+        create_node_engine(
+            url, f"replica-{i}",
+            settings.REPLICA_POOL_SIZE, settings.REPLICA_MAX_OVERFLOW,
+            settings.REPLICA_POOL_TIMEOUT, settings.REPLICA_POOL_RECYCLE,
+        ),
+        create_probe_engine(url),
+    )
+    for i, url in enumerate(settings.replica_db_urls)
+])
+health_monitor = HealthMonitor(replica_router)
+
+# Write transactions go through the writer, which retries across switchovers
+primary_writer = PrimaryWriter(primary_node)
 
 Base = declarative_base()
 
-@contextmanager
-def get_primary_db() -> Generator[Session, None, None]:
-    """Get a database session for write operations (primary node)"""
-    db = PrimarySessionLocal()
-    try:
+@asynccontextmanager
+async def get_async_replica_db(min_lsn: Optional[int] = None) -> AsyncGenerator[AsyncSession, None]:
+    """Get an async database session for read operations (least loaded healthy replica)"""
+    async with replica_router.session(min_lsn) as db:
         yield db
-    finally:
-        db.close()
 
-@contextmanager
-def get_replica_db() -> Generator[Session, None, None]:
-    """Get a database session for read operations (replica node)"""
-    db = ReplicaSessionLocal()
+@retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=0.5, max=4))
+def init_db() -> None:
+    """Initialize database with retries"""
+    # The app's tables are registered on Base when their models are imported
+    from app.models.item import REQUIRED_EXTENSIONS
     try:
-        yield db
+        for extension in REQUIRED_EXTENSIONS:
+            try:
+                with primary_engine.begin() as conn:
+                    conn.execute(text(f'CREATE EXTENSION IF NOT EXISTS "{extension}"'))
+            except DBAPIError as e:
+                logger.warning("Extension %s unavailable, skipping the indexes that need it: %s", extension, e.orig)
+        Base.metadata.create_all(bind=primary_engine)
+        # create_all skips tables that already exist, so add indexes introduced
+        # since the table was first created
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=primary_engine, checkfirst=True)
     finally:
-        db.close()
+        # Only the async engines serve requests; don't keep this pool open
+        primary_engine.dispose()
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-def init_db() -> None:
-    """Initialize database with retries"""
-    Base.metadata.create_all(bind=primary_engine)
+async def dispose_engines() -> None:
+    """Close all pooled connections held by the async engines"""
+    for node in [primary_node, *replica_router.replicas]:
+        await node.engine.dispose()
+        await node.probe_engine.dispose()
 
 # Dependency functions for FastAPI
-def get_primary_session() -> Generator[Session, None, None]:
-    with get_primary_db() as session:
-        yield session
+def consistency_token(request: Request) -> Optional[int]:
+    """Minimum LSN requested through the consistency header, if any"""
+    token = request.headers.get(CONSISTENCY_HEADER)
+    if not token:
+        return None
+    try:
+        return parse_lsn(token)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {CONSISTENCY_HEADER} header")
 
-def get_replica_session() -> Generator[Session, None, None]:
-    with get_replica_db() as session:
-        yield session 
\ No newline at end of file
+async def get_async_replica_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    async with get_async_replica_db(consistency_token(request)) as session:
+        yield session
@@ -1,9 +1,16 @@
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import items, health
 from app.core.config import settings
-from app.database.session import init_db
-import time
+from app.core.cache import invalidation_listener
+from app.core.metrics import mark_worker_dead
+from app.core.admission import admission_controller
+from app.core.middleware import AdmissionMiddleware, MetricsMiddleware
+from app.database.session import CONSISTENCY_HEADER, init_db, dispose_engines, health_monitor
+from app.database.failover import DatabaseUnavailableError
+import math
+import os
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -11,6 +18,18 @@ app = FastAPI(
     redoc_url="/redoc",
 )
 
+# Admission control for the database-backed routes; inside CORS so that
+# rejections still carry CORS headers
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission_controller,
+        routes=items.router.routes,
+        path_prefix="/items",
+        status_code=settings.ADMISSION_REJECT_STATUS,
+        retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+    )
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -18,28 +37,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[CONSISTENCY_HEADER],
 )
 
-# Request timing middleware
-@app.middleware("http")
-async def add_timing_middleware(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    
-    # Record metrics
-    health.REQUEST_LATENCY.labels(
-        method=request.method,
-        endpoint=request.url.path
-    ).observe(process_time)
-    
-    health.REQUEST_COUNT.labels(
-        method=request.method,
-        endpoint=request.url.path,
-        status=response.status_code
-    ).inc()
-    
-    return response
+# Request metrics; added last so it wraps the CORS middleware too
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(DatabaseUnavailableError)
+async def database_unavailable_handler(request: Request, exc: DatabaseUnavailableError):
+    """Tell clients to back off while the primary is switching over"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
 
 # Include routers
 app.include_router(items.router, tags=["items"])
@@ -48,7 +59,20 @@ app.include_router(health.router, tags=["health"])
 @app.on_event("startup")
 async def startup_event():
     """Initialize the database on startup"""
-    init_db()
+    if settings.DB_SCHEMA_INIT == "create":
+        init_db()
+    await health_monitor.start()
+    if settings.ITEM_CACHE_ENABLED:
+        invalidation_listener.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks and release pooled database connections"""
+    await invalidation_listener.stop()
+    await items.item_batcher.close()
+    await health_monitor.stop()
+    await dispose_engines()
+    mark_worker_dead(os.getpid())
 
 @app.get("/")
 async def root():
@@ -1,6 +1,19 @@
-from sqlalchemy import Column, Integer, String, DateTime, func
+from sqlalchemy import Column, Index, Integer, String, DateTime, func, literal_column, text
 from app.database.session import Base
 
+# Full-text document of an item. Searches must use this exact expression,
+# with literal constants, for the planner to match it to its GIN index
+SEARCH_DOCUMENT = "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"
+
+# Extensions the indexes below depend on, created by init_db when available
+REQUIRED_EXTENSIONS = ["pg_trgm"]
+
+def _has_pg_trgm(ddl, target, bind, **kw) -> bool:
+    """Whether pg_trgm is installed, so its indexes can be created"""
+    # Without the trigram indexes substring searches still work, bounded by
+    # the search statement timeout
+    return bind.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+
 class Item(Base):
     __tablename__ = "items"
 
@@ -8,4 +21,23 @@ class Item(Base):
     title = Column(String, index=True)
     description = Column(String)
     created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now()) 
\ No newline at end of file
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Covers version lookups for conditional GETs, so they can be answered
+        # by an index-only scan without reading the table rows
+        Index("ix_items_id_updated_at", "id", "updated_at"),
+        # Search: case-insensitive title prefixes, trigram substrings, full text
+        Index("ix_items_title_prefix", text("lower(title) text_pattern_ops")),
+        Index(
+            "ix_items_title_trgm", "title",
+            postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"},
+        ).ddl_if(callable_=_has_pg_trgm),
+        Index(
+            "ix_items_description_trgm", "description",
+            postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"},
+        ).ddl_if(callable_=_has_pg_trgm),
+        Index("ix_items_search_document", text(SEARCH_DOCUMENT), postgresql_using="gin"),
+    )
+
+search_document = literal_column(SEARCH_DOCUMENT)
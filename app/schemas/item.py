@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class ItemBase(BaseModel):
     title: str
@@ -12,10 +12,18 @@ class ItemCreate(ItemBase):
 class ItemUpdate(ItemBase):
     title: Optional[str] = None
 
+class ItemBulkUpdate(ItemUpdate):
+    id: int
+
 class Item(ItemBase):
     id: int
     created_at: datetime
     updated_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class ItemPage(BaseModel):
+    items: List[Item]
+    next_cursor: Optional[str] = None
+    estimated_total: Optional[int] = None
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""In-process benchmarks for the API request path.
+
+Drives app.main:app through httpx's ASGI transport, so every request goes
+through the middleware, routing, validation, serialization and database
+layers without a network hop. Each scenario reports requests/sec,
+latency percentiles and the memory allocated per request, and is checked
+against the budgets in baseline.json.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+# Rows per bulk request; the API accepts up to BULK_MAX_ITEMS (default 10000)
+BULK_SIZE = 50
+BULK_CHUNK = 5000
+
+def start_embedded_postgres(data_dir):
+    """Start a throwaway Postgres through the optional pgserver package"""
+    try:
+        import pgserver
+    except ImportError:
+        sys.exit("--embedded needs the pgserver package: pip install pgserver")
+    server = pgserver.get_server(data_dir, cleanup_mode="stop")
+    return server.get_uri()
+
+def configure_database(args):
+    """Point both the primary and the replica settings at the benchmark database"""
+    if args.embedded:
+        url = start_embedded_postgres(args.embedded_dir)
+    elif args.db_url:
+        url = args.db_url
+    elif os.environ.get("PRIMARY_DB_URL"):
+        # Use the environment as configured, including any separate replicas
+        return
+    else:
+        sys.exit("Set PRIMARY_DB_URL, pass --db-url, or use --embedded")
+    os.environ["PRIMARY_DB_URL"] = url
+    os.environ["REPLICA_DB_URL"] = url
+    os.environ.pop("REPLICA_DB_URLS", None)
+
+class BenchState:
+    """Ids shared between scenarios"""
+
+    def __init__(self):
+        self.items = []
+        self.disposable = []
+
+    def pick(self):
+        return random.choice(self.items)
+
+async def create_item(client, state):
+    response = await client.post("/items/", json={"title": "bench", "description": "in-process benchmark"})
+    state.disposable.append(response.json()["id"])
+    return response
+
+async def read_item(client, state):
+    return await client.get(f"/items/{state.pick()}")
+
+async def update_item(client, state):
+    item_id = state.pick()
+    return await client.put(f"/items/{item_id}", json={"title": f"bench {item_id}"})
+
+async def delete_item(client, state):
+    return await client.delete(f"/items/{state.disposable.pop()}")
+
+async def list_items(client, state):
+    return await client.get("/items/", params={"limit": 50})
+
+async def bulk_create(client, state):
+    response = await client.post("/items/bulk", json=[{"title": f"bulk {i}"} for i in range(BULK_SIZE)])
+    state.disposable.extend(item["id"] for item in response.json())
+    return response
+
+async def bulk_update(client, state):
+    ids = random.sample(state.items, BULK_SIZE)
+    return await client.patch("/items/bulk", json=[{"id": item_id, "description": "bulk"} for item_id in ids])
+
+async def bulk_delete(client, state):
+    ids = [state.disposable.pop() for _ in range(BULK_SIZE)]
+    return await client.request("DELETE", "/items/bulk", json=ids)
+
+async def search_prefix(client, state):
+    return await client.get("/items/search", params={"q": "Seed 4", "mode": "prefix", "limit": 20})
+
+async def search_substring(client, state):
+    return await client.get("/items/search", params={"q": "eed 4", "mode": "substring", "limit": 20})
+
+async def search_fulltext(client, state):
+    return await client.get("/items/search", params={"q": "benchmark seed", "mode": "fulltext", "limit": 20})
+
+async def export_items(client, state):
+    return await client.get("/items/export")
+
+async def health(client, state):
+    return await client.get("/health")
+
+async def readiness(client, state):
+    return await client.get("/health/ready")
+
+async def liveness(client, state):
+    return await client.get("/health/live")
+
+async def metrics(client, state):
+    return await client.get("/metrics")
+
+SCENARIOS = {
+    "create_item": create_item,
+    "read_item": read_item,
+    "update_item": update_item,
+    "delete_item": delete_item,
+    "list_items": list_items,
+    "bulk_create": bulk_create,
+    "bulk_update": bulk_update,
+    "bulk_delete": bulk_delete,
+    "export_items": export_items,
+    "search_prefix": search_prefix,
+    "search_substring": search_substring,
+    "search_fulltext": search_fulltext,
+    "health": health,
+    "readiness": readiness,
+    "liveness": liveness,
+    "metrics": metrics,
+}
+
+async def timed_pass(scenario, client, state, iterations, concurrency):
+    """Run the scenario from `concurrency` workers and return per-request latencies"""
+    latencies = []
+    remaining = iter(range(iterations))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await scenario(client, state)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{scenario.__name__} returned {response.status_code}: {response.text[:200]}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+async def allocation_pass(scenario, client, state, iterations):
+    """Median KiB allocated at peak while serving one request"""
+    samples = []
+    tracemalloc.start()
+    try:
+        for _ in range(iterations):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            await scenario(client, state)
+            samples.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+    finally:
+        tracemalloc.stop()
+    return statistics.median(samples)
+
+# Disposable rows each request of a scenario deletes
+DISPOSABLE_ROWS = {"delete_item": 1, "bulk_delete": BULK_SIZE}
+
+async def create_rows(client, rows):
+    """Create rows through the bulk endpoint, in chunks it accepts, returning their ids"""
+    ids = []
+    for start in range(0, len(rows), BULK_CHUNK):
+        response = await client.post("/items/bulk", json=rows[start:start + BULK_CHUNK])
+        ids.extend(item["id"] for item in response.json())
+    return ids
+
+async def delete_rows(client, ids):
+    for start in range(0, len(ids), BULK_CHUNK):
+        await client.request("DELETE", "/items/bulk", json=ids[start:start + BULK_CHUNK])
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+async def run_benchmarks(args):
+    import httpx
+    from app.main import app
+
+    selected = args.scenarios or list(SCENARIOS)
+    # Enough disposable rows for every delete the run will issue
+    requests = args.warmup + args.iterations + args.alloc_iterations
+    deletes = requests * sum(DISPOSABLE_ROWS.get(name, 0) for name in selected)
+    results = {}
+    state = BenchState()
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            state.items = await create_rows(client, [
+                {"title": f"Seed {i}", "description": "benchmark seed row"} for i in range(500)
+            ])
+            state.disposable = await create_rows(client, [{"title": "disposable"}] * deletes)
+
+            for name in selected:
+                scenario = SCENARIOS[name]
+                await timed_pass(scenario, client, state, args.warmup, 1)
+                latencies, elapsed = await timed_pass(scenario, client, state, args.iterations, args.concurrency)
+                alloc_kib = await allocation_pass(scenario, client, state, args.alloc_iterations)
+                results[name] = {
+                    "rps": args.iterations / elapsed,
+                    "p50_ms": percentile(latencies, 50) * 1000,
+                    "p99_ms": percentile(latencies, 99) * 1000,
+                    "alloc_kib": alloc_kib,
+                }
+                print(f"{name:<18}{results[name]['rps']:>10.1f}{results[name]['p50_ms']:>10.2f}"
+                      f"{results[name]['p99_ms']:>10.2f}{alloc_kib:>12.1f}")
+
+            await delete_rows(client, state.items + state.disposable)
+    return results
+
+def check_budgets(results, baseline, tolerance):
+    """Return a description of every scenario that is slower or allocates more than its budget"""
+    failures = []
+    for name, result in results.items():
+        budget = baseline.get(name)
+        if budget is None:
+            continue
+        min_rps = budget["rps"] * (1 - tolerance)
+        max_alloc = budget["alloc_kib"] * (1 + tolerance)
+        if result["rps"] < min_rps:
+            failures.append(f"{name}: {result['rps']:.1f} req/s is below the budget of {min_rps:.1f}")
+        if result["alloc_kib"] > max_alloc:
+            failures.append(f"{name}: {result['alloc_kib']:.1f} KiB/request exceeds the budget of {max_alloc:.1f}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process API benchmarks")
+    parser.add_argument("--db-url", help="Postgres URL to benchmark against (default: PRIMARY_DB_URL)")
+    parser.add_argument("--embedded", action="store_true",
+                        help="Start a throwaway Postgres with the pgserver package")
+    parser.add_argument("--embedded-dir", default="/tmp/cloudnativepg-bench",
+                        help="Data directory for --embedded (default: /tmp/cloudnativepg-bench)")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS),
+                        help="Scenarios to run (default: all)")
+    parser.add_argument("--iterations", type=int, default=200,
+                        help="Timed requests per scenario (default: 200)")
+    parser.add_argument("--warmup", type=int, default=20,
+                        help="Untimed requests per scenario before measuring (default: 20)")
+    parser.add_argument("--alloc-iterations", type=int, default=20,
+                        help="Requests per scenario traced for allocations (default: 20)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Concurrent in-process clients (default: 1)")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed regression relative to the baseline (default: 0.2)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH,
+                        help="Budget file (default: benchmarks/baseline.json)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Store this run's results as the new baseline")
+    parser.add_argument("--json", type=Path, help="Also write the results as JSON to this path")
+    args = parser.parse_args()
+
+    configure_database(args)
+    sys.path.insert(0, str(ROOT))
+
+    print(f"{'scenario':<18}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'alloc KiB':>12}")
+    results = asyncio.run(run_benchmarks(args))
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update({
+            name: {"rps": round(result["rps"], 1), "alloc_kib": round(result["alloc_kib"], 1)}
+            for name, result in results.items()
+        })
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one")
+        return
+    failures = check_budgets(results, json.loads(args.baseline.read_text()), args.tolerance)
+    if failures:
+        print("\nBudget exceeded:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll scenarios within budget")
+
+if __name__ == "__main__":
+    main()
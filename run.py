@@ -1,10 +1,127 @@
+import argparse
+import glob
+import math
+import os
+import tempfile
+from typing import Optional
 import uvicorn
 from app.core.config import settings
 
-if __name__ == "__main__":
+def cgroup_cpu_limit() -> Optional[int]:
+    """CPUs allowed by the container's CPU quota, if it has one (cgroup v2 or v1)"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        return None if quota == "max" else max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        # A quota of -1 means unlimited
+        return max(1, math.ceil(quota / period)) if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+def available_cpus() -> int:
+    """CPUs this process may use, honouring a container CPU limit"""
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        return limit
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def init_schema_once() -> None:
+    """Create missing tables in the launcher so workers can start without doing it"""
+    if settings.DB_SCHEMA_INIT != "create":
+        return
+    from app.database.session import init_db
+    init_db()
+    # Workers read their settings from the environment they inherit
+    os.environ["DB_SCHEMA_INIT"] = "skip"
+    settings.DB_SCHEMA_INIT = "skip"
+
+def apply_connection_budget(workers: int) -> None:
+    """Size each worker's pools so the pod stays within DB_CONNECTIONS_PER_POD per node.
+
+    Each worker gets an equal share, split between pool_size and
+    max_overflow in the configured ratio. Every worker also holds one probe
+    connection per node and, with the item cache on, a LISTEN connection to
+    the primary, both outside its pools.
+    """
+    budget = settings.DB_CONNECTIONS_PER_POD
+    if not budget:
+        return
+    per_worker = budget // workers
+    listeners = 1 if settings.ITEM_CACHE_ENABLED else 0
+    for prefix, capacity in (("PRIMARY", per_worker - 1 - listeners), ("REPLICA", per_worker - 1)):
+        if capacity < 1:
+            raise SystemExit(
+                f"DB_CONNECTIONS_PER_POD={budget} leaves no {prefix.lower()} connections for {workers} workers"
+            )
+        size = getattr(settings, f"{prefix}_POOL_SIZE")
+        overflow = max(getattr(settings, f"{prefix}_MAX_OVERFLOW"), 0)
+        pool_size = max(1, capacity * size // (size + overflow))
+        # The environment reaches worker processes; settings covers a single
+        # worker, which serves from this process once session.py is imported
+        os.environ[f"{prefix}_POOL_SIZE"] = str(pool_size)
+        os.environ[f"{prefix}_MAX_OVERFLOW"] = str(capacity - pool_size)
+        setattr(settings, f"{prefix}_POOL_SIZE", pool_size)
+        setattr(settings, f"{prefix}_MAX_OVERFLOW", capacity - pool_size)
+
+def prepare_metrics_dir(workers: int) -> None:
+    """Give workers a clean shared directory for Prometheus multiprocess mode"""
+    if workers < 2:
+        return
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        os.makedirs(path, exist_ok=True)
+        # Samples left over from a previous run would be added to this one
+        for stale in glob.glob(os.path.join(path, "*.db")):
+            os.remove(stale)
+    else:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the API server")
+    parser.add_argument("--prod", action="store_true",
+                        help="Run worker processes without auto-reload")
+    parser.add_argument("--workers", type=int, default=settings.WEB_CONCURRENCY,
+                        help="Worker processes with --prod (default: WEB_CONCURRENCY, or one per available CPU)")
+    args = parser.parse_args()
+
+    if not args.prod:
+        uvicorn.run(
+            "app.main:app",
+            host="0.0.0.0",
+            port=settings.APP_PORT,
+            reload=True
+        )
+        return
+
+    workers = args.workers or available_cpus()
+    # Before init_schema_once, whose import of app.database.session creates the pools
+    apply_connection_budget(workers)
+    init_schema_once()
+    # Set after the schema step so the launcher's own metrics stay in memory
+    prepare_metrics_dir(workers)
+    # Each worker is a fresh interpreter that imports the app, and with it
+    # creates its own engines and pools; nothing is shared across a fork.
+    # "auto" selects uvloop and httptools, installed by uvicorn[standard].
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=settings.APP_PORT,
-        reload=True
-    ) 
\ No newline at end of file
+        workers=workers,
+        loop="auto",
+        http="auto",
+        # On SIGTERM stop accepting connections and let in-flight requests
+        # finish before the shutdown handlers dispose the pools
+        timeout_graceful_shutdown=settings.SHUTDOWN_GRACE_SECONDS,
+    )
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,63 @@ from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 import argparse
 import json
+import math
 import backoff
+from collections import Counter, defaultdict
+
+class LatencyHistogram:
+    """Log-linear latency histogram in the style of HdrHistogram.
+
+    Values are recorded in microseconds, keeping their top SUB_BUCKET_BITS
+    bits. Each power-of-two range is therefore split into
+    2**(SUB_BUCKET_BITS - 1) linear buckets, so every reported percentile
+    overstates the true value by under 1% while memory stays bounded.
+    """
+
+    SUB_BUCKET_BITS = 8
+
+    def __init__(self):
+        self.counts = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, micros):
+        shift = max(micros.bit_length() - self.SUB_BUCKET_BITS, 0)
+        return shift, micros >> shift
+
+    def record(self, seconds):
+        micros = max(int(seconds * 1_000_000), 0)
+        self.counts[self._bucket(micros)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, pct):
+        if not self.count:
+            return None
+        target = max(math.ceil(self.count * pct / 100), 1)
+        seen = 0
+        for shift, value in sorted(self.counts, key=lambda b: b[1] << b[0]):
+            seen += self.counts[(shift, value)]
+            if seen >= target:
+                # Report the top of the bucket so percentiles never under-state latency
+                return min((((value + 1) << shift) - 1) / 1_000_000, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "min": self.min,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "p99.9": self.percentile(99.9),
+            "max": self.max,
+        }
 
 class APILoadTester:
     def __init__(self, base_url="http://localhost:8000"):
@@ -34,9 +90,11 @@ class APILoadTester:
                     async with getattr(session, method.lower())(url, **kwargs) as response:
                         if response.status == 200:
                             return await response.json()
-                        elif response.status == 429:  # Too Many Requests
-                            await asyncio.sleep(1)  # Wait before retry
-                            raise aiohttp.ClientError("Rate limit exceeded")
+                        elif response.status in (429, 503):  # Shed by admission control
+                            # Honour Retry-After, with jitter so retries don't arrive together
+                            retry_after = float(response.headers.get("Retry-After", 1))
+                            await asyncio.sleep(retry_after * random.uniform(1, 1.5))
+                            raise aiohttp.ClientError(f"HTTP {response.status}, retrying")
                         else:
                             raise aiohttp.ClientError(f"HTTP {response.status}")
                 except Exception as e:
@@ -179,6 +237,161 @@ class APILoadTester:
         print(f"Average requests per second: {num_requests/duration:.2f}")
         self.print_stats()
 
+def parse_mix(spec):
+    """Parse a workload mix such as 'read=60,update=20,create=15,list=5'"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OpenLoopLoadTester.OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation '{name}' in mix")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("Mix must give at least one operation a positive weight")
+    return mix
+
+class OpenLoopLoadTester:
+    """Constant-arrival-rate load generator.
+
+    Requests are started on a fixed schedule regardless of how many are
+    still in flight, and latency is measured from each request's intended
+    start time. A slow server therefore shows up as growing latency
+    instead of silently lowering the offered load (coordinated omission).
+    """
+
+    OPERATIONS = ("create", "read", "update", "delete", "list")
+
+    def __init__(self, base_url, rps, duration, mix, arrival="constant", seed_items=100, max_connections=1000):
+        self.base_url = base_url
+        self.rps = rps
+        self.duration = duration
+        self.mix = mix
+        self.arrival = arrival
+        self.seed_items = seed_items
+        self.max_connections = max_connections
+        self.items = []
+        self.latency = defaultdict(LatencyHistogram)
+        self.service_time = defaultdict(LatencyHistogram)
+        self.outcomes = defaultdict(Counter)
+        self.timeline = defaultdict(lambda: {"ok": 0, "error": 0})
+        self.scheduled = 0
+        self.start_time = None
+        self.elapsed = 0.0
+
+    def _request_spec(self, operation):
+        """Method, path and body for the next request of an operation"""
+        if operation in ("read", "update", "delete") and not self.items:
+            operation = "create"
+        if operation == "create":
+            return operation, "post", "/items/", {"title": f"Load {self.scheduled}", "description": "open-loop"}
+        if operation == "list":
+            return operation, "get", "/items/", None
+        item_id = random.choice(self.items)
+        if operation == "read":
+            return operation, "get", f"/items/{item_id}", None
+        if operation == "update":
+            return operation, "put", f"/items/{item_id}", {"title": f"Updated {item_id}"}
+        self.items.remove(item_id)
+        return operation, "delete", f"/items/{item_id}", None
+
+    async def _issue(self, session, operation, method, path, body, intended_start):
+        sent = time.perf_counter()
+        try:
+            async with session.request(method, f"{self.base_url}{path}", json=body) as response:
+                payload = await response.read()
+                outcome = str(response.status)
+                ok = response.status < 400
+                if ok and operation == "create":
+                    self.items.append(json.loads(payload)["id"])
+        except Exception as e:
+            outcome = type(e).__name__
+            ok = False
+        finished = time.perf_counter()
+        self.latency[operation].record(finished - intended_start)
+        self.service_time[operation].record(finished - sent)
+        self.outcomes[operation][outcome] += 1
+        self.timeline[int(finished - self.start_time)]["ok" if ok else "error"] += 1
+
+    async def _seed(self, session):
+        if self.seed_items <= 0:
+            return
+        body = [{"title": f"Seed {i}", "description": "open-loop seed"} for i in range(self.seed_items)]
+        async with session.post(f"{self.base_url}/items/bulk", json=body) as response:
+            if response.status == 200:
+                self.items.extend(item["id"] for item in await response.json())
+
+    async def run(self):
+        operations = list(self.mix)
+        weights = [self.mix[op] for op in operations]
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            await self._seed(session)
+            print(f"Offering {self.rps} req/s for {self.duration}s ({self.arrival} arrivals)...")
+            tasks = set()
+            self.start_time = time.perf_counter()
+            next_start = self.start_time
+            end = self.start_time + self.duration
+            while next_start < end:
+                delay = next_start - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                operation = random.choices(operations, weights)[0]
+                spec = self._request_spec(operation)
+                task = asyncio.create_task(self._issue(session, *spec, next_start))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                self.scheduled += 1
+                if self.arrival == "poisson":
+                    next_start += random.expovariate(self.rps)
+                else:
+                    next_start += 1 / self.rps
+            await asyncio.gather(*tasks)
+        self.elapsed = time.perf_counter() - self.start_time
+
+    def report(self):
+        completed = sum(h.count for h in self.latency.values())
+        return {
+            "config": {
+                "base_url": self.base_url,
+                "target_rps": self.rps,
+                "duration": self.duration,
+                "arrival": self.arrival,
+                "mix": self.mix,
+            },
+            "started_at": datetime.now().isoformat(),
+            "elapsed": self.elapsed,
+            "scheduled": self.scheduled,
+            "completed": completed,
+            "achieved_rps": completed / self.elapsed if self.elapsed else 0,
+            "operations": {
+                operation: {
+                    "latency": self.latency[operation].summary(),
+                    "service_time": self.service_time[operation].summary(),
+                    "outcomes": dict(self.outcomes[operation]),
+                }
+                for operation in self.latency
+            },
+            "timeline": [
+                {"second": second, **counts} for second, counts in sorted(self.timeline.items())
+            ],
+        }
+
+    def print_report(self, report):
+        print("\nOpen-loop Results:")
+        print("=" * 78)
+        print(f"Scheduled {report['scheduled']} requests, completed {report['completed']} "
+              f"in {report['elapsed']:.2f}s ({report['achieved_rps']:.1f} req/s)")
+        print(f"\n{'operation':<10}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'p99.9 ms':>10}{'max ms':>10}")
+        for operation, data in report["operations"].items():
+            latency = data["latency"]
+            print(f"{operation:<10}{latency['count']:>8}" + "".join(
+                f"{latency[key] * 1000:>10.2f}" for key in ("p50", "p90", "p99", "p99.9", "max")
+            ))
+        print("\nOutcomes:")
+        for operation, data in report["operations"].items():
+            print(f"  {operation}: " + ", ".join(f"{k}={v}" for k, v in sorted(data["outcomes"].items())))
+
 async def health_check(url="http://localhost:8000"):
     try:
         async with aiohttp.ClientSession() as session:
@@ -197,6 +410,21 @@ async def main():
                       help='Number of requests to perform (default: 10000)')
     parser.add_argument('--url', type=str, default="http://localhost:8000",
                       help='Base URL of the API (default: http://localhost:8000)')
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed',
+                      help='closed: fixed request count with capped concurrency; '
+                           'open: constant arrival rate (default: closed)')
+    parser.add_argument('--rps', type=float, default=100,
+                      help='Open-loop arrival rate in requests per second (default: 100)')
+    parser.add_argument('--duration', type=float, default=60,
+                      help='Open-loop test duration in seconds (default: 60)')
+    parser.add_argument('--mix', type=parse_mix, default="read=60,update=20,create=15,list=5",
+                      help='Open-loop workload weights (default: read=60,update=20,create=15,list=5)')
+    parser.add_argument('--arrival', choices=['constant', 'poisson'], default='constant',
+                      help='Open-loop inter-arrival distribution (default: constant)')
+    parser.add_argument('--seed-items', type=int, default=100,
+                      help='Items created before an open-loop run for reads and updates (default: 100)')
+    parser.add_argument('--report', type=str,
+                      help='Write the open-loop results as JSON to this path')
     args = parser.parse_args()
 
     # Check if the API is available
@@ -205,6 +433,18 @@ async def main():
         print("Error: API is not available. Please make sure the application is running.")
         return
 
+    if args.mode == 'open':
+        tester = OpenLoopLoadTester(args.url, args.rps, args.duration, args.mix,
+                                    arrival=args.arrival, seed_items=args.seed_items)
+        await tester.run()
+        report = tester.report()
+        tester.print_report(report)
+        if args.report:
+            with open(args.report, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"\nReport written to {args.report}")
+        return
+
     # Run the load test
     tester = APILoadTester(args.url)
     await tester.run_test(args.requests)